@@ -1,17 +1,27 @@
 import requests
-from requests.exceptions import RequestException, Timeout, ConnectionError, HTTPError
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 from concurrent.futures import ThreadPoolExecutor, as_completed
+from collections import namedtuple
+from types import MappingProxyType
 import threading
 import time
 import random
 import argparse
 import getpass
 import hashlib
+import heapq
+import os
+import shelve
+import atexit
+import httpx
+import numpy as np
+import orjson
 import pylast
 from pylast import WSError
 
 import config
-from rapidfuzz import fuzz
+from rapidfuzz import fuzz, process, utils
 
 # ----------------------------
 # General settings
@@ -41,16 +51,90 @@ if TEST_MODE:
     BREAK_AT_FIRST_PAGE = True
     MAX_WORKERS = 3
 
-# Persistent HTTP session for connection pooling
+# Persistent HTTP session for connection pooling.
+# Transient HTTP failures are retried by urllib3 at the adapter level (honoring Retry-After).
 navidrome_session = requests.Session()
+_navidrome_adapter = HTTPAdapter(
+    pool_connections=MAX_WORKERS,
+    pool_maxsize=MAX_WORKERS * 2,
+    max_retries=Retry(
+        total=3,
+        backoff_factor=1,
+        status_forcelist=[429, 500, 502, 503, 504],
+        allowed_methods=["GET"],
+        respect_retry_after_header=True,
+        raise_on_status=False,
+    ),
+)
+navidrome_session.mount("http://", _navidrome_adapter)
+navidrome_session.mount("https://", _navidrome_adapter)
+
+# ----------------------------
+# Last.fm HTTP transport
+# ----------------------------
+
+# pylast opens a new httpx.Client (TCP + TLS handshake) for every API call.
+# Route all of its requests through one shared, thread-safe keep-alive client instead.
+lastfm_client = httpx.Client(
+    verify=pylast.SSL_CONTEXT,
+    headers=pylast.HEADERS,
+    timeout=httpx.Timeout(5, read=20),
+    limits=httpx.Limits(max_keepalive_connections=MAX_WORKERS + 4),
+)
+
+def _download_response_shared(self):
+    """Same as pylast's _Request._download_response, but reuses lastfm_client."""
+    if self.network.limit_rate:
+        self.network._delay_call()
+
+    username = self.params.pop("username", None)
+    username = "" if username is None else f"?username={username}"
+
+    (host_name, host_subdir) = self.network.ws_server
+    try:
+        response = lastfm_client.post(f"https://{host_name}{host_subdir}{username}", data=self.params)
+    except Exception as e:
+        raise pylast.NetworkError(self.network, e) from e
+
+    if response.status_code in (500, 502, 503, 504):
+        raise WSError(
+            self.network,
+            response.status_code,
+            f"Connection to the API failed with HTTP code {response.status_code}",
+        )
+
+    response_text = pylast._unicode(response.read())
+    self._check_response_for_errors(response_text)
+    return response_text
+
+pylast._Request._download_response = _download_response_shared
 
 # ----------------------------
 # Helpers
 # ----------------------------
 
-def retry_with_backoff(func, max_retries=6, initial_delay=1, backoff_factor=3, *args, **kwargs):
+RATE_LIMIT_MIN_DELAY = 10  # seconds to wait at least after a Last.fm rate limit error
+
+def _jittered_delay(delay, max_delay):
+    """Cap the backoff delay and spread it randomly so parallel workers don't retry in lockstep."""
+    return min(max_delay, delay) * random.uniform(0.5, 1.5)
+
+def _is_rate_limit_error(e):
+    """pylast reports Last.fm rate limiting as a WSError, not as an HTTP 429."""
+    return isinstance(e, WSError) and (
+        str(e.status) == str(pylast.STATUS_RATE_LIMIT_EXCEEDED) or "rate limit exceeded" in str(e).lower()
+    )
+
+def _is_not_found_error(e):
+    """True only for Last.fm's "Track not found" answer, not for rate limits or outages."""
+    return isinstance(e, WSError) and (
+        str(e.status) == str(pylast.STATUS_INVALID_PARAMS) or "not found" in str(e).lower()
+    )
+
+def retry_with_backoff(func, max_retries=6, initial_delay=1, backoff_factor=3, max_delay=60, *args, **kwargs):
     """
-    Retry a function with exponential backoff.
+    Retry a pylast call with jittered exponential backoff.
+    Navidrome requests are retried by navidrome_session's adapter instead.
     """
     delay = initial_delay
     last_exception = None
@@ -58,37 +142,21 @@ def retry_with_backoff(func, max_retries=6, initial_delay=1, backoff_factor=3, *
     for attempt in range(max_retries):
         try:
             return func(*args, **kwargs)
-        except (RequestException, ConnectionError, Timeout, WSError) as e:
+        except (WSError, pylast.NetworkError) as e:
+            # pylast raises NetworkError for transport failures, e.g. a dropped keep-alive connection
             last_exception = e
             if attempt < max_retries - 1:
-                print(f"  ⚠️  Network error (attempt {attempt + 1}/{max_retries}): {str(e)[:100]}")
-                print(f"  ⏳ Retrying in {delay}s...")
-                time.sleep(delay)
+                sleep_for = _jittered_delay(delay, max_delay)
+                if _is_rate_limit_error(e):
+                    sleep_for = max(RATE_LIMIT_MIN_DELAY, sleep_for)
+                    print(f"  ⚠️  Rate limited by Last.fm (attempt {attempt + 1}/{max_retries})")
+                else:
+                    print(f"  ⚠️  Network error (attempt {attempt + 1}/{max_retries}): {str(e)[:100]}")
+                print(f"  ⏳ Retrying in {sleep_for:.1f}s...")
+                time.sleep(sleep_for)
                 delay *= backoff_factor
             else:
                 print(f"  ❌ Failed after {max_retries} attempts: {str(e)[:100]}")
-        except HTTPError as e:
-            # Check if it's a rate limit error (429) or server error (5xx)
-            if hasattr(e, 'response') and e.response is not None:
-                status_code = e.response.status_code
-                if status_code == 429:
-                    # Rate limit - wait longer
-                    retry_after = int(e.response.headers.get('Retry-After', delay * 2))
-                    print(f"  ⚠️  Rate limited (429). Waiting {retry_after}s...")
-                    time.sleep(retry_after)
-                    if attempt < max_retries - 1:
-                        continue
-                elif 500 <= status_code < 600:
-                    # Server error - retry
-                    if attempt < max_retries - 1:
-                        print(f"  ⚠️  Server error {status_code} (attempt {attempt + 1}/{max_retries})")
-                        print(f"  ⏳ Retrying in {delay}s...")
-                        time.sleep(delay)
-                        delay *= backoff_factor
-                        continue
-            last_exception = e
-            print(f"  ❌ HTTP error: {str(e)[:100]}")
-            break
         except Exception as e:
             # Unexpected error - don't retry
             last_exception = e
@@ -97,20 +165,6 @@ def retry_with_backoff(func, max_retries=6, initial_delay=1, backoff_factor=3, *
 
     raise last_exception if last_exception else Exception("Retry failed with no exception")
 
-def normalize(s):
-    return s.lower().strip()
-
-# Cache for normalized strings to avoid redundant normalization
-_normalize_cache = {}
-
-def normalize_cached(s):
-    if s not in _normalize_cache:
-        _normalize_cache[s] = s.lower().strip()
-    return _normalize_cache[s]
-
-def fuzzy_match(a, b):
-    return fuzz.token_sort_ratio(normalize_cached(a), normalize_cached(b))
-
 def _encode_plus(s):
     """Replace + with %2B to survive Last.fm's broken form decoder.
 
@@ -171,9 +225,31 @@ def _call_track_getinfo(track):
     print(f"  [DEBUG] track.getInfo: artist={repr(canonical_artist)} title={repr(canonical_title)} plays={playcount}")
     return canonical_artist, canonical_title, playcount
 
-def find_track(artist, title, net=None):
+def _match_key(raw, norm):
+    """Normalized name for exact comparison; punctuation-only names normalize to '', so use them lowercased."""
+    return norm or raw.lower().strip()
+
+def find_track(artist, title, net=None, artist_norm=None, title_norm=None, raise_on_error=False):
     if net is None:
         net = network
+    if artist_norm is None:
+        artist_norm = utils.default_process(artist)
+    if title_norm is None:
+        title_norm = utils.default_process(title)
+
+    def _resolve_candidate(track):
+        try:
+            ca, ct, pc = _call_track_getinfo(track)
+        except WSError as e:
+            if not _is_not_found_error(e):
+                raise  # Let retry_with_backoff handle rate limits and outages
+            return None
+        track._canonical_artist = ca
+        track._canonical_title = ct
+        track._userplaycount = pc
+        print('  -> matched!', '|', track.artist, '|', track.title, '|')
+        return track
+
     def _find():
         try:
             track = net.get_track(artist, title)
@@ -183,6 +259,8 @@ def find_track(artist, title, net=None):
             track._userplaycount = pc
             return track
         except WSError as wse:
+            if not _is_not_found_error(wse):
+                raise  # Let retry_with_backoff handle rate limits and outages
             # print('track not found by exact match:', artist, '|', title)
 
             results = net.search_for_track(
@@ -190,24 +268,43 @@ def find_track(artist, title, net=None):
                 track_name=title,
             ).get_next_page()
 
-            for track in results[:10]:
-
-                # fuzzy_match(artist, artist) < config.FUZZY_THRESHOLD
-                artist_val = fuzzy_match(artist, str(track.artist))
-                title_val = fuzzy_match(title, str(track.title))
-
-                # print(int(artist_val), int(title_val), track.artist, "-", track.title)
+            candidates = results[:10]
+            cand_artists = [utils.default_process(str(t.artist)) for t in candidates]
+            cand_titles = [utils.default_process(str(t.title)) for t in candidates]
+
+            # Exact matches first, these don't need any fuzzy scoring
+            query_key = (_match_key(artist, artist_norm), _match_key(title, title_norm))
+            exact = [i for i, t in enumerate(candidates)
+                     if (_match_key(str(t.artist), cand_artists[i]), _match_key(str(t.title), cand_titles[i])) == query_key]
+            for i in exact:
+                track = _resolve_candidate(candidates[i])
+                if track is not None:
+                    return track
+
+            rest = [i for i in range(len(candidates)) if i not in exact]
+            if not rest:
+                return None
+
+            # Score the remaining artist and title pairs in a single pairwise call.
+            # Every string is preprocessed exactly once, so rapidfuzz can skip its own processor.
+            n = len(rest)
+            scores = process.cpdist(
+                [artist_norm] * n + [title_norm] * n,
+                [cand_artists[i] for i in rest] + [cand_titles[i] for i in rest],
+                scorer=fuzz.token_sort_ratio,
+                processor=None,
+                score_cutoff=config.FUZZY_THRESHOLD,
+            )
 
-                if artist_val >= config.FUZZY_THRESHOLD and title_val >= config.FUZZY_THRESHOLD:
-                    try:
-                        ca, ct, pc = _call_track_getinfo(track)
-                        track._canonical_artist = ca
-                        track._canonical_title = ct
-                        track._userplaycount = pc
-                        print('  -> matched!', '|', track.artist, '|', track.title, '|')
-                        return track
-                    except WSError:
-                        continue
+            # Like process.extractOne, try the best match first, but require
+            # both artist and title to pass the threshold on their own
+            match_scores = np.minimum(scores[:n], scores[n:])
+            for j in np.argsort(-match_scores, kind="stable"):
+                if match_scores[j] < config.FUZZY_THRESHOLD:
+                    break
+                track = _resolve_candidate(candidates[rest[j]])
+                if track is not None:
+                    return track
 
         return None
 
@@ -215,26 +312,134 @@ def find_track(artist, title, net=None):
         return retry_with_backoff(_find, max_retries=3)
     except Exception as e:
         print(f'  ❌ Failed to find track after retries: {artist} - {title}')
+        if raise_on_error:
+            raise
         return None
 
 
+# Whole Last.fm library keyed by normalized (artist, title), filled once by fetch_lastfm_library
+LASTFM_LIBRARY = {}
+def fetch_lastfm_library():
+    """
+    Fetch all of the user's Last.fm tracks with playcounts in one paginated
+    user.getTopTracks pull, so most lookups don't need a per-track request.
+    """
+    user = network.get_user(config.LASTFM_USERNAME)
+
+    def _fetch():
+        return user.get_top_tracks(period=pylast.PERIOD_OVERALL, limit=None)
+
+    top_items = retry_with_backoff(_fetch, max_retries=5, initial_delay=2)
+
+    for item in top_items:
+        artist = str(item.item.artist)
+        title = str(item.item.title)
+        # scrobble_once sends names with + as %2B (see _encode_plus), which lands on a
+        # different entry than this one, so these are always resolved via track.getInfo
+        if '+' in artist or '+' in title:
+            continue
+        key = (utils.default_process(artist), utils.default_process(title))
+        # Punctuation-only names normalize to '' and would collide with each other
+        if not key[0] or not key[1]:
+            continue
+        # Top tracks are sorted by playcount, so the first entry for a key is the main one
+        if key not in LASTFM_LIBRARY:
+            LASTFM_LIBRARY[key] = {
+                'playcount': int(item.weight),
+                'canonical_artist': artist,
+                'canonical_title': title,
+            }
+
+    print(f"  → {len(LASTFM_LIBRARY)} unique tracks from Last.fm")
+
+
+# Tracks that couldn't be found on Last.fm, persisted across runs so the
+# expensive search fallback isn't repeated for them every time
+LOOKUP_CACHE_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "lastfm_cache.db")
+NOT_FOUND_TTL = 30 * 24 * 60 * 60  # seconds before a not-found track is looked up again
+# The shelve is only touched from the main thread (some dbm backends, like dbm.sqlite3,
+# can't be shared between threads); workers read and write these in-memory copies
+_lookup_cache = {}
+_lookup_cache_updates = {}
+_lookup_cache_lock = threading.Lock()
+
+def load_lookup_cache():
+    """Load the persisted lookups and write new ones back on exit. Without a usable file the run just has no cache."""
+    try:
+        with shelve.open(LOOKUP_CACHE_FILE) as db:
+            _lookup_cache.update(db.items())
+    except Exception as e:
+        print(f"  ⚠️  Failed to open lookup cache, continuing without it: {str(e)[:100]}")
+        return
+    atexit.register(save_lookup_cache)
+
+def save_lookup_cache():
+    with _lookup_cache_lock:
+        updates = dict(_lookup_cache_updates)
+        _lookup_cache_updates.clear()
+    if not updates:
+        return
+    try:
+        with shelve.open(LOOKUP_CACHE_FILE) as db:
+            db.update(updates)
+    except Exception as e:
+        print(f"  ⚠️  Failed to save lookup cache: {str(e)[:100]}")
+
+def _is_known_not_found(artist, title):
+    entry = _lookup_cache.get(repr((artist, title)))
+    return entry is not None and entry['not_found'] and time.time() - entry['last_checked'] < NOT_FOUND_TTL
+
+def _record_lookup(artist, title, playcount):
+    """Remember a lookup result; playcount is None if the track wasn't found."""
+    entry = {
+        'playcount': playcount or 0,
+        'not_found': playcount is None,
+        'last_checked': time.time(),
+    }
+    with _lookup_cache_lock:
+        _lookup_cache[repr((artist, title))] = entry
+        _lookup_cache_updates[repr((artist, title))] = entry
+
+
 LASTFM_PLAYCOUNTS = {}
-def get_lastfm_playcount(artist, title):
+_playcounts_lock = threading.Lock()
+def get_lastfm_playcount(artist, title, artist_norm=None, title_norm=None, net=None):
     if not((artist, title) in LASTFM_PLAYCOUNTS):
-        try:
-            track = find_track(artist, title)
-            if track is None:
-                LASTFM_PLAYCOUNTS[(artist, title)] = {}
-            else:
-                LASTFM_PLAYCOUNTS[(artist, title)] = {
-                    'playcount': track._userplaycount,
-                    'scrobbled_this_run_count': 0,
-                    'canonical_artist': track._canonical_artist,
-                    'canonical_title': track._canonical_title,
-                }
-        except Exception as e:
-            print(f"  ⚠️  Error getting Last.fm playcount for {artist} - {title}: {str(e)[:100]}")
-            LASTFM_PLAYCOUNTS[(artist, title)] = {}
+        if artist_norm is None:
+            artist_norm = utils.default_process(artist)
+        if title_norm is None:
+            title_norm = utils.default_process(title)
+
+        # Prefer the bulk-fetched library, only search Last.fm on a miss.
+        # Names with + must match the %2B entry scrobble_once writes to, which only getInfo finds.
+        if '+' in artist or '+' in title or not artist_norm or not title_norm:
+            library_entry = None
+        else:
+            library_entry = LASTFM_LIBRARY.get((artist_norm, title_norm))
+        if library_entry is not None:
+            pc_data = {**library_entry, 'scrobbled_this_run_count': 0}
+        elif _is_known_not_found(artist, title):
+            pc_data = {}
+        else:
+            try:
+                track = find_track(artist, title, net, artist_norm=artist_norm, title_norm=title_norm, raise_on_error=True)
+                _record_lookup(artist, title, None if track is None else track._userplaycount)
+                if track is None:
+                    pc_data = {}
+                else:
+                    pc_data = {
+                        'playcount': track._userplaycount,
+                        'scrobbled_this_run_count': 0,
+                        'canonical_artist': track._canonical_artist,
+                        'canonical_title': track._canonical_title,
+                    }
+            except Exception as e:
+                print(f"  ⚠️  Error getting Last.fm playcount for {artist} - {title}: {str(e)[:100]}")
+                pc_data = {}
+
+        # Lookups run in parallel, so only the mutation is done under the lock
+        with _playcounts_lock:
+            LASTFM_PLAYCOUNTS.setdefault((artist, title), pc_data)
 
     pc_data = LASTFM_PLAYCOUNTS[(artist, title)]
     if pc_data is None or 'playcount' not in pc_data:
@@ -285,25 +490,29 @@ def scrobble_once(artist, title, dry_run):
 # ----------------------------
 # Navidrome API
 # ----------------------------
+# Parameters sent with every Subsonic API call, built once
+_NAVIDROME_BASE_PARAMS = MappingProxyType({
+    "u": config.NAVIDROME_USERNAME,
+    "p": config.NAVIDROME_PASSWORD,
+    "v": "1.16.1",
+    "c": "ND2LastFM",
+    "f": "json",
+})
+
 def api_call(endpoint, params):
-    base = {
-        "u": config.NAVIDROME_USERNAME,
-        "p": config.NAVIDROME_PASSWORD,
-        "v": "1.16.1",
-        "c": "ND2LastFM",
-        "f": "json",
-    }
+    request_params = dict(_NAVIDROME_BASE_PARAMS)
+    request_params.update(params)
 
     def _make_request():
         try:
             r = navidrome_session.get(
                 f"{config.NAVIDROME_API_URL}/{endpoint}",
-                params={**base, **params},
+                params=request_params,
                 timeout=30,
             )
             r.raise_for_status()
 
-            json_response = r.json()
+            json_response = orjson.loads(r.content)
             if "subsonic-response" not in json_response:
                 raise ValueError("Invalid API response: missing 'subsonic-response'")
 
@@ -314,105 +523,127 @@ def api_call(endpoint, params):
                 raise Exception(f"Navidrome API error: {error.get('message', 'Unknown error')}")
 
             return response_data
-        except requests.exceptions.JSONDecodeError as e:
+        except orjson.JSONDecodeError as e:
             raise Exception(f"Invalid JSON response from Navidrome: {str(e)}")
 
-    return retry_with_backoff(_make_request, max_retries=3)
+    # Network and HTTP errors are already retried by navidrome_session's adapter
+    return _make_request()
+
+# One Navidrome track; artist_norm/title_norm are precomputed for matching against Last.fm
+Track = namedtuple("Track", "artist title playcount artist_norm title_norm")
 
 def fetch_album_songs(album_id):
     """
     Fetch songs for a single album.
-    Returns list of track dicts with playcount > 0.
+    Returns list of Tracks with playcount > 0.
     """
     try:
         album_resp = api_call("getAlbum.view", {"id": album_id})
         songs = album_resp.get("album", {}).get("song", [])
 
-        tracks = []
-        for s in songs:
-            playcount = s.get("playCount", 0)
-            if playcount > 0:
-                tracks.append(
-                    {
-                        "artist": s.get("artist"),
-                        "title": s.get("title"),
-                        "playcount": playcount,
-                    }
-                )
-        return tracks
+        return [
+            Track(
+                s.get("artist"),
+                s.get("title"),
+                playcount,
+                utils.default_process(s.get("artist")),
+                utils.default_process(s.get("title")),
+            )
+            for s in songs
+            if (playcount := s.get("playCount", 0)) > 0
+        ]
     except Exception as e:
         print(f"  ⚠️  Failed to fetch album {album_id}: {str(e)[:100]}")
         return []
 
+def fetch_album_page(offset, size):
+    """
+    Fetch a single page of the album list.
+    """
+    resp = api_call(
+        "getAlbumList2.view",
+        {"type": "alphabeticalByName", "offset": offset, "size": size},
+    )
+    return resp.get("albumList2", {}).get("album", [])
+
 def fetch_all_tracks():
     """
-    Fetches all albums, then all songs per album (in parallel).
-    Returns [{artist, title, playcount}]
+    Fetches all album list pages, then all songs per album (in parallel).
+    Returns [Track]
     """
     tracks = []
+    albums = []
     offset = 0
     size = NAVIDROME_PAGE_COUNT
 
-    while True:
-        try:
-            resp = api_call(
-                "getAlbumList2.view",
-                {"type": "alphabeticalByName", "offset": offset, "size": size},
-            )
-
-            albums = resp.get("albumList2", {}).get("album", [])
-            if not albums:
+    with ThreadPoolExecutor(max_workers=MAX_WORKERS) as executor:
+        # The total album count is unknown, so fetch 1, 2, 4, ... pages at a time
+        # until a short page shows up
+        batch = 1
+        while True:
+            offsets = [offset + i * size for i in range(batch)]
+            futures = [executor.submit(fetch_album_page, o, size) for o in offsets]
+
+            # Keep pages in order up to the first short or failed one
+            last_page = False
+            for page_offset, future in zip(offsets, futures):
+                try:
+                    page = future.result()
+                except Exception as e:
+                    print(f"  ❌ Failed to fetch album list at offset {page_offset}: {str(e)[:100]}")
+                    # If we already have some albums, we can continue
+                    if len(albums) > 0:
+                        print(f"  → Proceeding with {len(albums)} albums already fetched")
+                        last_page = True
+                        break
+                    else:
+                        raise  # Re-raise if we have no albums at all
+
+                albums.extend(page)
+                if len(page) < size:
+                    last_page = True
+                    break
+
+            print(f"  → Fetched {len(albums)} albums so far")
+
+            if last_page or BREAK_AT_FIRST_PAGE:
                 break
 
-            # Fetch songs for all albums in parallel
-            print(f"  Fetching songs for {len(albums)} albums in parallel...")
-            with ThreadPoolExecutor(max_workers=MAX_WORKERS) as executor:
-                # Submit all album fetches
-                future_to_album = {
-                    executor.submit(fetch_album_songs, album["id"]): album["id"]
-                    for album in albums
-                }
-
-                # Collect results as they complete
-                for future in as_completed(future_to_album):
-                    album_tracks = future.result()
-                    tracks.extend(album_tracks)
+            offset += batch * size
+            batch *= 2
 
-            print(f"  → Fetched {len(tracks)} total tracks so far")
-
-            offset += len(albums)
-            if len(albums) < size:
-                break
+        # Fetch songs for all albums in parallel
+        print(f"  Fetching songs for {len(albums)} albums in parallel...")
+        future_to_album = {
+            executor.submit(fetch_album_songs, album["id"]): album["id"]
+            for album in albums
+        }
 
-            if BREAK_AT_FIRST_PAGE:
-                break
+        # Collect results as they complete
+        for future in as_completed(future_to_album):
+            album_tracks = future.result()
+            tracks.extend(album_tracks)
 
-        except Exception as e:
-            print(f"  ❌ Failed to fetch album list at offset {offset}: {str(e)[:100]}")
-            print(f"  → Will retry or skip if retries exhausted...")
-            # If we already have some tracks, we can continue
-            if len(tracks) > 0:
-                print(f"  → Proceeding with {len(tracks)} tracks already fetched")
-                break
-            else:
-                raise  # Re-raise if we have no tracks at all
+    print(f"  → Fetched {len(tracks)} total tracks")
 
     # Merge tracks with same artist+title (Last.fm doesn't distinguish by album)
-    # Use lowercase key for matching, but preserve original casing from the entry with highest playcount
+    # Use the same normalized key as the Last.fm library lookup, so no two tracks end up
+    # sharing one Last.fm entry, but preserve original casing from the entry with highest playcount.
+    # Names made only of punctuation/symbols normalize to '', so those fall back to a lowercase key.
     merged = {}
     for t in tracks:
         # if t['title'].lower().strip() != 'u + ur hand':
         #     continue
 
-        key = (t["artist"].lower().strip(), t["title"].lower().strip())
-        if key not in merged:
-            merged[key] = {"artist": t["artist"], "title": t["title"], "playcount": t["playcount"]}
-        else:
-            merged[key]["playcount"] += t["playcount"]
+        key = (t.artist_norm or t.artist.lower().strip(), t.title_norm or t.title.lower().strip())
+        prev = merged.get(key)
+        if prev is None:
+            merged[key] = t
+        elif t.playcount > prev.playcount:
             # Keep the casing from the entry with the most plays
-            if t["playcount"] > merged[key]["playcount"] - t["playcount"]:
-                merged[key]["artist"] = t["artist"]
-                merged[key]["title"] = t["title"]
+            merged[key] = prev._replace(artist=t.artist, title=t.title, playcount=prev.playcount + t.playcount)
+        else:
+            merged[key] = prev._replace(playcount=prev.playcount + t.playcount)
 
     tracks = list(merged.values())
     print(f"  → {len(tracks)} unique tracks after merging duplicates")
@@ -440,6 +671,32 @@ def main(dry_run, max_scrobbles):
         print("Please check your network connection and Navidrome configuration.")
         return
 
+    try:
+        print("Fetching all tracks from Last.fm...")
+        fetch_lastfm_library()
+    except Exception as e:
+        print(f"  ⚠️  Failed to fetch Last.fm library, falling back to per-track lookups: {str(e)[:100]}")
+
+    load_lookup_cache()
+
+    # Resolve all Last.fm playcounts up front in parallel, the loop below then only hits the cache.
+    # Workers share the already authenticated network, its requests go through the thread-safe lastfm_client.
+    resolve_start = time.time()
+    print(f"Resolving Last.fm playcounts with {MAX_WORKERS} parallel workers...")
+    with ThreadPoolExecutor(max_workers=MAX_WORKERS) as executor:
+        list(executor.map(
+            lambda t: get_lastfm_playcount(t.artist, t.title, t.artist_norm, t.title_norm, network),
+            tracks,
+        ))
+    resolve_duration = time.time() - resolve_start
+    print(f"Resolved {len(LASTFM_PLAYCOUNTS)} Last.fm playcounts in {resolve_duration:.2f}s")
+
+    # Weighted random selection based on playcount (higher playcount = higher priority).
+    # Every track gets a random exponential "next turn" with rate = playcount; taking the
+    # earliest one is the same as a weighted random pick, but costs O(log N) instead of O(N).
+    queue = [(random.expovariate(t.playcount), i) for i, t in enumerate(tracks)]
+    heapq.heapify(queue)
+
     total_scrobbled = 0
     # initial_track_count = len(tracks)
 
@@ -456,7 +713,7 @@ def main(dry_run, max_scrobbles):
         # progress_pct = (processed / initial_track_count * 100) if initial_track_count > 0 else 0
         # print(f"Progress: {processed}/{initial_track_count} tracks processed ({progress_pct:.1f}%)")
 
-        if len(tracks) == 0:
+        if len(queue) == 0:
             print("\n✅ Done. No more tracks to process.")
             break
 
@@ -464,16 +721,12 @@ def main(dry_run, max_scrobbles):
             print(f"\n🛑 Reached scrobble limit ({max_scrobbles}). Stopping.")
             break
 
-        # Select track with weighted random based on playcount (higher playcount = higher priority)
-        playcounts = [t["playcount"] for t in tracks]
-        total_playcount = sum(playcounts)
-        weights = [playcount / total_playcount for playcount in playcounts]
-        idx = random.choices(range(len(tracks)), weights=weights, k=1)[0]
+        turn, idx = queue[0]
         t = tracks[idx]
 
-        artist = t["artist"]
-        title = t["title"]
-        nd_count = t["playcount"]
+        artist = t.artist
+        title = t.title
+        nd_count = t.playcount
 
 
         # artist = 'Vildhjarta'
@@ -481,7 +734,7 @@ def main(dry_run, max_scrobbles):
 
         can_scrobble = True
 
-        lf_count = get_lastfm_playcount(artist, title)
+        lf_count = get_lastfm_playcount(artist, title, t.artist_norm, t.title_norm)
         if lf_count is None:
             can_scrobble = False
         elif lf_count >= nd_count:
@@ -493,7 +746,7 @@ def main(dry_run, max_scrobbles):
 
         if not can_scrobble:
             print(f"[SKIP]  {artist} – {title} | Navidrome={nd_count} Last.fm={lf_count} → no scrobble needed/possible")
-            tracks.pop(idx)
+            heapq.heappop(queue)
 
         else:
             delta = nd_count - lf_count
@@ -505,7 +758,9 @@ def main(dry_run, max_scrobbles):
             except Exception as e:
                 print(f"  ⚠️  Scrobble failed, will retry this track later")
                 # Don't remove the track from the list, so it can be retried later
-                # But continue with next track to avoid getting stuck
+
+            # Schedule the track's next turn, so it competes with all others again
+            heapq.heapreplace(queue, (turn + random.expovariate(t.playcount), idx))
 
 
 
@@ -755,8 +1010,8 @@ def main_delete(dry_run):
         futures = {
             executor.submit(
                 process_track_for_deletion,
-                t["artist"], t["title"], t["playcount"], web_session, dry_run, counter, total, lock
-            ): (t["artist"], t["title"])
+                t.artist, t.title, t.playcount, web_session, dry_run, counter, total, lock
+            ): (t.artist, t.title)
             for t in nd_tracks
         }
 